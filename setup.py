@@ -18,4 +18,5 @@ setup(name='rpi_epd3in7',
       package_dir={"": "src"},
       packages=setuptools.find_packages(where="src"),
       python_requires=">=3.6",
+      install_requires=["numpy", "spidev>=3.5"],
 )
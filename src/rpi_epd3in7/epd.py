@@ -31,17 +31,34 @@
 from __future__ import unicode_literals, division, absolute_import
 
 import time
+import asyncio
+import hashlib
+import struct
+import threading
 import spidev
 import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from .lut import LUT
-import RPi.GPIO as GPIO
+from .gpio import default_backend
 
 # Pin definition
 RST_PIN = 17
 DC_PIN = 25
-CS_PIN = 8
+CS_PIN = 8  # CE0, driven by the SPI controller
 BUSY_PIN = 24
 
+# SPI bus clock; requires `dtparam=spi=on` in /boot/config.txt. Transfers
+# longer than 96 bytes are handed to DMA by the spi-bcm2835 driver
+SPI_SPEED_HZ = 32000000
+
+# upper bound on a single wait for the BUSY falling edge before the pin is
+# read again, so a missed edge costs no more than the old 10ms poll
+BUSY_EDGE_TIMEOUT_MS = 10
+
+# spidev kernel module transfer size limit
+SPIDEV_BUFSIZ_PATH = "/sys/module/spidev/parameters/bufsiz"
+
 # Display resolution
 EPD_WIDTH = 280
 EPD_HEIGHT = 480
@@ -76,6 +93,74 @@ RAM_Y_SET = 0x45
 RAM_X_COUNTER = 0x4E
 RAM_Y_COUNTER = 0x4F
 
+# register setup sent by init() once the RAM has been cleared, as
+# (command, parameters) pairs
+_INIT_HEAD = (
+    (GATE_SET, bytes([0xDF, 0x01, 0x00])),  # setting gaet number
+    (GATE_VOLTAGE_SET, bytes([0x00])),  # set gate voltage
+    (SOURCE_VOLTAGE_SET, bytes([0x41, 0xA8, 0x32])),  # set source voltage
+    (DATA_ENTRY_SEQUENCE_SET, bytes([0x03])),  # set data entry sequence
+    (BORDER_SET, bytes([0x03])),  # set border
+    (BOOSTER_SET, bytes([0xAE, 0xC7, 0xC3, 0xC0, 0xC0])),  # booster strength
+    (INTERNAL_SENSOR_COMMAND, bytes([0x80])),  # set internal sensor on
+    (VCOM_VALUE, bytes([0x44])),  # set vcom value
+)
+_INIT_TAIL = (
+    # setting X and Y direction start/end position of RAM
+    (RAM_X_SET, bytes([0x00, 0x00, 0x17, 0x01])),
+    (RAM_Y_SET, bytes([0x00, 0x00, 0xDF, 0x01])),
+    (DISPLAY_UPDATE_CONTROL_2, bytes([0xCF])),
+)
+# set display option, these setting turn on previous function. The first
+# byte (0x00) means it can switch 1 gray or 4 gray
+_INIT_FAST = _INIT_HEAD + ((DISPLAY_OPTION_SET, bytes([
+    0x00, 0xFF, 0xFF, 0xFF, 0xFF, 0x4F, 0xFF, 0xFF, 0xFF, 0xFF,
+])),) + _INIT_TAIL
+_INIT_SLOW = _INIT_HEAD + ((DISPLAY_OPTION_SET, bytes(10)),) + _INIT_TAIL
+
+# moves the RAM address counters to the first pixel
+_RAM_ORIGIN = ((RAM_X_COUNTER, bytes(2)), (RAM_Y_COUNTER, bytes(2)))
+
+# 4-gray level of each 8-bit pixel value, kept in the top 2 bits: light gray
+# (0xC0) and dark gray (0x80) are shifted down one level, anything else
+# keeps its own top 2 bits
+_GRAY_REMAP = np.arange(256, dtype=np.uint8) & 0xC0
+_GRAY_REMAP[0xC0] = 0x80
+_GRAY_REMAP[0x80] = 0x40
+
+
+def _spidev_bufsiz(default=4096):
+    """ Largest transfer the spidev driver accepts in one ioctl. Raise it with
+    the `spidev.bufsiz=65536` kernel parameter (appended to
+    /boot/cmdline.txt) to send a whole frame in fewer transfers """
+    try:
+        with open(SPIDEV_BUFSIZ_PATH) as f:
+            return int(f.read())
+    except (IOError, ValueError):
+        return default
+
+
+# RAM plane bit for each 2-bit 4-gray code:
+# 0 black, 1 gray2 (0x40), 2 gray1 (0x80), 3 white (0xC0)
+_BW_BITS = (0, 1, 0, 1)
+_RED_BITS = (0, 0, 1, 1)
+
+
+def _nibble_lut(bits):
+    """ Build a table mapping a 4-gray buffer byte (4 pixels) to half a byte
+    of a RAM plane, using `bits` to map each 2-bit code to a plane bit """
+    bits = np.array(bits, dtype=np.uint8)
+    values = np.arange(0x100, dtype=np.uint8)
+    lut = np.zeros(0x100, dtype=np.uint8)
+    for pixel in range(4):
+        code = (values >> (6 - 2 * pixel)) & 0x03
+        lut |= bits[code] << (3 - pixel)
+    return lut
+
+
+_NIBBLE_LUT_BW = _nibble_lut(_BW_BITS)
+_NIBBLE_LUT_RED = _nibble_lut(_RED_BITS)
+
 
 class EPD(object):
     DPI = EPD_DPI
@@ -85,10 +170,30 @@ class EPD(object):
     GRAY2 = 0xC0  # Close to white
     GRAY3 = 0x80  # Close to black
     GRAY4 = 0x00  # black
-
-    def __init__(self, partial_refresh_limit=32):
+    # hardware reset timing, override on boards that need longer
+    RESET_PULSE_MS = 2  # RST held low
+    RESET_SETTLE_MS = 20  # RST held high before and after the pulse
+    # delay after the controller reports idle on entering deep sleep, before
+    # SPI and GPIO are released
+    SLEEP_SETTLE_MS = 100
+    # fastest SPI clock probe_speed() tries, needs short wiring
+    MAX_SAFE_HZ = 48000000
+    # size of a 1 bit per pixel RAM plane
+    _BYTES_PER_ROW = EPD_WIDTH // 8
+    _FRAME_BYTES = EPD_HEIGHT * _BYTES_PER_ROW
+    # all-white RAM plane, shared by every clear()
+    _BLANK_PLANE = bytes([GRAY1]) * _FRAME_BYTES
+
+    def __init__(self, partial_refresh_limit=32, spi_speed_hz=SPI_SPEED_HZ,
+                 gpio=None):
         """ Initialize the EPD class.
         `partial_refresh_limit` - number of partial refreshes before a full refrersh is forced
+        `spi_speed_hz` - SPI clock requested from the driver, which rounds it
+                         down to a rate the SPI controller can divide to.
+                         Short wiring can run well above the default
+        `gpio` - GPIO backend from the gpio module, e.g. LgpioBackend(chip=4)
+                 for a Pi 5 on kernels that expose its header as gpiochip4.
+                 Defaults to lgpio on chip 0, or RPi.GPIO without lgpio
         `fast_frefresh` - enable or disable the fast refresh mode,
                           see smart_update() method documentation for details"""
         self.width = EPD_WIDTH
@@ -97,362 +202,458 @@ class EPD(object):
         """ Display height, in pixels """
         self.partial_refresh_limit = partial_refresh_limit
         """ number of partial refreshes before a full refrersh is forced """
+        self.spi_speed_hz = spi_speed_hz
+        """ SPI clock speed, in Hz, applied by init() """
 
         self._last_frame = None
+        self._last_image = None
         self._partial_refresh_count = 0
         self._init_performed = False
+        self._executor = None
+        self._frame_executor = None
+        self._dc_state = None
+        self._idle = threading.Event()
+        # RAM planes for 4-gray frames, refilled in place on every display()
+        self._plane_bw = np.empty(self._FRAME_BYTES, dtype=np.uint8)
+        self._plane_red = np.empty_like(self._plane_bw)
+        self._nibbles = np.empty_like(self._plane_bw)
         self.spi = spidev.SpiDev()
+        self.gpio = gpio if gpio is not None else default_backend()
+        self._spi_block_size = _spidev_bufsiz()
         self.lut = LUT
 
         self.log = logging.getLogger(__name__)
 
     def digital_write(self, pin, value):
-        return GPIO.output(pin, value)
+        return self.gpio.output(pin, value)
 
     def digital_read(self, pin):
-        return GPIO.input(pin)
+        return self.gpio.input(pin)
 
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
+    def _spi_write(self, dc, data):
+        """ Send `data` over SPI with the DC pin set to `dc`
+        (0: command, 1: data) """
+        if dc != self._dc_state:
+            # DC only needs to change between command and data transfers
+            self.digital_write(DC_PIN, dc)
+            self._dc_state = dc
+        block_size = self._spi_block_size
+        if len(data) <= block_size:
+            self.spi.writebytes2(data)
+            return
+
+        # one write per kernel buffer; slicing a memoryview avoids copies
+        if isinstance(data, list):
+            data = bytearray(data)
+        data = memoryview(data)
+        for start in range(0, len(data), block_size):
+            self.spi.writebytes2(data[start:start + block_size])
+
     def send_command(self, command):
-        self.digital_write(DC_PIN, 0)
-        self.digital_write(CS_PIN, 0)
-        self.spi.writebytes([command])
-        self.digital_write(CS_PIN, 1)
+        self._spi_write(0, bytes((command,)))
 
     def send_data(self, data):
-        self.digital_write(DC_PIN, 1)
-        self.digital_write(CS_PIN, 0)
-        self.spi.writebytes([data])
-        self.digital_write(CS_PIN, 1)
+        self._spi_write(1, bytes((data,)))
 
     def send_data2(self, data):
-        self.digital_write(DC_PIN, 1)
-        self.digital_write(CS_PIN, 0)
-        self.spi.writebytes2(data)
-        self.digital_write(CS_PIN, 1)
+        self._spi_write(1, data)
+
+    def _background(self):
+        """ Single worker thread used to overlap SPI transfers with the CPU
+        work of preparing the next buffer """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        return self._executor
+
+    def send_command_with_data(self, command, data):
+        """ Send a command followed by all of its parameter bytes in a single
+        data transfer """
+        self.send_command(command)
+        self.send_data2(data)
+
+    def _set_window(self, x_start, y_start, x_end, y_end):
+        """ Limit RAM writes to a rectangle of pixels, bounds inclusive, and
+        move the RAM address counters to its top-left corner """
+        self.send_command_with_data(RAM_X_SET,
+                                    struct.pack('<HH', x_start, x_end))
+        self.send_command_with_data(RAM_Y_SET,
+                                    struct.pack('<HH', y_start, y_end))
+        self.send_command_with_data(RAM_X_COUNTER, struct.pack('<H', x_start))
+        self.send_command_with_data(RAM_Y_COUNTER, struct.pack('<H', y_start))
+
+    def _forget_ram(self):
+        """ Drop what is cached about the RAM contents, after something other
+        than display() overwrote them """
+        self._last_frame = None
+        self._last_image = None
+
+    def _reset_ram_counters(self):
+        """ Point the RAM address counters back at the top-left pixel """
+        for command, data in _RAM_ORIGIN:
+            self.send_command_with_data(command, data)
+
+    def _write_frame_changes(self, image_buffer):
+        """ Write a 1-gray frame buffer to BW RAM, sending only the rectangle
+        of bytes that changed since the previous frame """
+        frame = np.frombuffer(image_buffer, dtype=np.uint8)
+        frame = frame.reshape(self.height, self._BYTES_PER_ROW)
+        # RAM contents are unknown until the write below goes through
+        last_frame, self._last_frame = self._last_frame, None
+
+        if last_frame is None:
+            self._set_window(0, 0, self.width - 1, self.height - 1)
+            self.send_command_with_data(WRITE_RAM_BW, image_buffer)
+            self._last_frame = frame
+            return
+
+        changed = frame != last_frame
+        rows = np.flatnonzero(changed.any(axis=1))
+        if rows.size:
+            cols = np.flatnonzero(changed.any(axis=0))
+            top, bottom = int(rows[0]), int(rows[-1])
+            left, right = int(cols[0]), int(cols[-1])
+            self._write_window(frame, left, top, right, bottom)
+        self._last_frame = frame
+
+    def _write_window(self, frame, left, top, right, bottom):
+        """ Copy the bytes of a (rows, bytes per row) 1-gray `frame` between
+        columns `left` and `right` and rows `top` and `bottom`, inclusive, to
+        the same place in BW RAM """
+        # RAM X addresses are in pixels, each frame buffer byte holds 8
+        self._set_window(left * 8, top, right * 8 + 7, bottom)
+        window = frame[top:bottom + 1, left:right + 1]
+        self.send_command_with_data(WRITE_RAM_BW, window.tobytes())
+        self._set_window(0, 0, self.width - 1, self.height - 1)
 
     def reset(self):
         """ Module reset """
         self.digital_write(RST_PIN, 1)
-        self.delay_ms(200)
+        self.delay_ms(self.RESET_SETTLE_MS)
         self.digital_write(RST_PIN, 0)
-        self.delay_ms(5)
+        self.delay_ms(self.RESET_PULSE_MS)
         self.digital_write(RST_PIN, 1)
-        self.delay_ms(200)
+        self.delay_ms(self.RESET_SETTLE_MS)
 
     def sleep(self):
         """Put the chip into a deep-sleep mode to save power.
         The deep sleep mode would return to standby by hardware reset.
         Use EPD.reset() to awaken and use EPD.init() to initialize. """
-        self.send_command(0X50)  # DEEP_SLEEP_MODE
-        self.send_data(0xf7)
+        self.send_command_with_data(0X50, bytes([0xF7]))  # DEEP_SLEEP_MODE
         self.send_command(POWER_OFF)  # power off
-        self.send_command(0X07)  # deep sleep
         # deep sleep requires 0xa5 as a "check code" parameter
-        self.send_data(0xA5)
+        self.send_command_with_data(0X07, bytes([0xA5]))  # deep sleep
+
+        # the old fixed 2s delay is now only the worst case
+        self.wait_until_idle(timeout_ms=2000)
+        self.delay_ms(self.SLEEP_SETTLE_MS)
+        for executor in (self._executor, self._frame_executor):
+            if executor is not None:
+                executor.shutdown()
+        self._executor = None
+        self._frame_executor = None
 
-        self.delay_ms(2000)
         self.log.debug("spi end")
         self.spi.close()
 
         self.log.debug("close 5V, Module enters 0 power consumption ...")
-        GPIO.output(RST_PIN, 0)
-        GPIO.output(DC_PIN, 0)
+        self.digital_write(RST_PIN, 0)
+        self.digital_write(DC_PIN, 0)
 
-        GPIO.cleanup()
+        self.gpio.cleanup()
+        self._dc_state = None
+        self._forget_ram()
 
     def init(self, fast=True):
         """ Preform the hardware initialization sequence """
         # Interface initialization:
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setwarnings(False)
-        GPIO.setup(RST_PIN, GPIO.OUT)
-        GPIO.setup(DC_PIN, GPIO.OUT)
-        GPIO.setup(CS_PIN, GPIO.OUT)
-        GPIO.setup(BUSY_PIN, GPIO.IN)
+        self.gpio.open()
+        self.gpio.setup_output(RST_PIN)
+        self.gpio.setup_output(DC_PIN)
+        # pulled down so a disconnected panel does not look busy forever
+        self.gpio.setup_input(BUSY_PIN, pull_down=True)
+        if not self.gpio.watch_falling(BUSY_PIN, self._idle.set):
+            self.log.warning("Busy pin edge detection unavailable, "
+                             "polling it instead")
+        self._dc_state = None
 
         self.spi.open(0, 0)
-        self.spi.max_speed_hz = 32000000
+        self.spi.max_speed_hz = self.spi_speed_hz
         self.spi.mode = 0b00
+        # CS is CE0 of SPI0, let the SPI controller assert it around each
+        # transfer rather than toggling it from Python
+        self.spi.no_cs = False
+        self.spi.cshigh = False
         # EPD hardware init start
         self.reset()
 
         self.send_command(SW_RESET)
         self.delay_ms(300)
 
-        self.send_command(AUTO_WRITE_REGULAR_PATTERN_RED_RAM)
-        self.send_data(0xF7)
+        self.send_command_with_data(AUTO_WRITE_REGULAR_PATTERN_RED_RAM,
+                                    bytes([0xF7]))
         self.wait_until_idle()
-        self.send_command(AUTO_WRITE_REGULAR_PATTERN_BW_RAM)
-        self.send_data(0xF7)
+        self.send_command_with_data(AUTO_WRITE_REGULAR_PATTERN_BW_RAM,
+                                    bytes([0xF7]))
         self.wait_until_idle()
 
-        self.send_command(GATE_SET)  # setting gaet number
-        self.send_data2([
-            0xDF,
-            0x01,
-            0x00
-        ])
-
-        self.send_command(GATE_VOLTAGE_SET)  # set gate voltage
-        self.send_data(0x00)
-
-        self.send_command(SOURCE_VOLTAGE_SET)  # set source voltage
-        self.send_data2([
-            0x41,
-            0xA8,
-            0x32
-        ])
-
-        self.send_command(DATA_ENTRY_SEQUENCE_SET)  # set data entry sequence
-        self.send_data(0x03)
-
-        self.send_command(BORDER_SET)  # set border
-        self.send_data(0x03)
-
-        self.send_command(BOOSTER_SET)  # set booster strength
-        self.send_data2([
-            0xAE,
-            0xC7,
-            0xC3,
-            0xC0,
-            0xC0
-        ])
-
-        self.send_command(INTERNAL_SENSOR_COMMAND)  # set internal sensor on
-        self.send_data(0x80)
-
-        self.send_command(VCOM_VALUE)  # set vcom value
-        self.send_data(0x44)
-
-        # set display option, these setting turn on previous function
-        self.send_command(DISPLAY_OPTION_SET)
-        if fast:
-            self.send_data2([
-                0x00,  # can switch 1 gray or 4 gray
-                0xFF,
-                0xFF,
-                0xFF,
-                0xFF,
-                0x4F,
-                0xFF,
-                0xFF,
-                0xFF,
-                0xFF,
-            ])
-        else:
-            self.send_data2([
-                0x00,  # can switch 1 gray or 4 gray
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-            ])
-
-        # setting X direction start/end position of RAM
-        self.send_command(RAM_X_SET)
-        self.send_data2([
-            0x00,
-            0x00,
-            0x17,
-            0x01,
-        ])
-
-        # setting Y direction start/end position of RAM
-        self.send_command(RAM_Y_SET)
-        self.send_data2([
-            0x00,
-            0x00,
-            0xDF,
-            0x01,
-        ])
-
-        self.send_command(DISPLAY_UPDATE_CONTROL_2)  # Display Update Control 2
-        self.send_data(0xCF)
+        for command, data in (_INIT_FAST if fast else _INIT_SLOW):
+            self.send_command_with_data(command, data)
         # EPD hardware init end
         self._init_performed = True
+        # RAM was just overwritten by the auto write patterns
+        self._forget_ram()
+
+    def probe_speed(self, speeds=None):
+        """ Switch to the fastest SPI clock in `speeds` (by default
+        MAX_SAFE_HZ, 40MHz, then SPI_SPEED_HZ) at which the controller still
+        responds, and return it.
+        Each speed is checked by starting the same RAM fill init() does and
+        looking for the busy pin to go high, so this only catches links that
+        fail outright, not occasional bit errors. Call it after init() """
+        if speeds is None:
+            speeds = (self.MAX_SAFE_HZ, 40000000, SPI_SPEED_HZ)
+        speeds = tuple(speeds)
+        if not speeds:
+            raise ValueError("No SPI speeds to probe")
+
+        for speed in speeds:
+            self.spi.max_speed_hz = speed
+            self.send_command_with_data(AUTO_WRITE_REGULAR_PATTERN_BW_RAM,
+                                        bytes([0xF7]))
+            responded = self.digital_read(BUSY_PIN) == 1
+            # a garbled command can leave the busy pin stuck high
+            if not self.wait_until_idle(timeout_ms=2000):
+                responded = False
+            if responded:
+                break
+            self.log.debug("no response at %d Hz", speed)
+        else:
+            self.log.warning("Display did not respond at any probed speed")
+
+        self._forget_ram()
+        self.spi_speed_hz = speed
+        return speed
 
     def load_lut(self, lut):
-        self.send_command(LUT_VALUE)
-        self.send_data2(lut)
+        self.send_command_with_data(LUT_VALUE, bytes(lut))
 
     def getbuffer(self, image, mode):
         img = image
         imwidth, imheight = img.size
 
         if mode == self.MODE_1GRAY:
-            if(imwidth == self.width and imheight == self.height):
-                img = img.convert(mode)
-            elif(imwidth == self.height and imheight == self.width):
+            if(imwidth == self.height and imheight == self.width):
                 # image has correct dimensions, but needs to be rotated
-                img = img.rotate(90, expand=True).convert(mode)
-            else:
+                img = img.rotate(90, expand=True)
+            elif(imwidth != self.width or imheight != self.height):
                 logging.warning("Wrong image dimensions: must be " +
                                 str(self.width) + "x" + str(self.height))
                 # return a blank buffer
-                return [0x00] * (int(self.width/8) * self.height)
+                return bytes(self._FRAME_BYTES)
 
-            buf = bytearray(img.tobytes('raw'))
+            if img.mode != mode:
+                img = img.convert(mode)
+
+            # PIL packs mode '1' images 8 pixels per byte, MSB first, which is
+            # already the layout the controller expects
+            buf = img.tobytes('raw')
 
         if mode == self.MODE_4GRAY:
-            buf = [0xFF] * (int(self.width / 4) * self.height)
-            pixels = img.load()
-            i = 0
-
-            for x in range(imwidth):
-                for y in range(imheight):
-                    newx = y
-                    newy = imwidth - x - 1
-                    if(pixels[x, y] == 0xC0):
-                        pixels[x, y] = 0x80
-                    elif (pixels[x, y] == 0x80):
-                        pixels[x, y] = 0x40
-                    i = i + 1
-                    if(i % 4 == 0):
-                        buf[int((newx + (newy * self.width))/4)] = ((pixels[x, y-3] & 0xc0) | (
-                            pixels[x, y-2] & 0xc0) >> 2 | (pixels[x, y-1] & 0xc0) >> 4 | (pixels[x, y] & 0xc0) >> 6)
+            if img.mode != mode:
+                img = img.convert(mode)
+            pixels = np.asarray(img, dtype=np.uint8)
+
+            if(imwidth == self.height and imheight == self.width):
+                # image has correct dimensions, but needs to be rotated
+                pixels = np.rot90(pixels)
+            elif(imwidth != self.width or imheight != self.height):
+                logging.warning("Wrong image dimensions: must be " +
+                                str(self.width) + "x" + str(self.height))
+                # return a blank buffer
+                return bytes(2 * self._FRAME_BYTES)
+
+            # pack 4 pixels per byte, leftmost pixel in the most
+            # significant bits
+            pixels = _GRAY_REMAP[pixels].reshape(-1, 4)
+            buf = (pixels[:, 0] | pixels[:, 1] >> 2 |
+                   pixels[:, 2] >> 4 | pixels[:, 3] >> 6).tobytes()
         return buf
 
-    def display(self, image):
-        """ Display a full frame, doing a full screen refresh """
+    def prepare_frame(self, image):
+        """ Start converting `image` to a frame buffer on a background thread,
+        e.g. while the previous frame is still refreshing. The image must not
+        be modified until the conversion finishes. Pass the returned future
+        to display_prepared() """
+        if self._frame_executor is None:
+            # a single worker, the Pi has few cores to spare
+            self._frame_executor = ThreadPoolExecutor(max_workers=1)
+        mode = image.mode
+        return self._frame_executor.submit(
+            lambda: (mode, self.getbuffer(image, mode)))
+
+    def display_prepared(self, frame):
+        """ Display a frame returned by prepare_frame(), doing a full screen
+        refresh """
+        mode, image_buffer = frame.result()
+        self._display_buffer(image_buffer, mode)
+
+    def display_partial(self, image, x, y, w, h):
+        """ Update only the `w` x `h` pixel box at (`x`, `y`) of a full 1-gray
+        frame, given in panel (portrait) coordinates. Only that box, widened
+        to whole bytes, is sent, and the panel is refreshed with the fast A2
+        waveform. After `partial_refresh_limit` partial updates, the whole
+        frame is sent and refreshed with the GC waveform instead, to clear
+        ghosting """
         if not self._init_performed:
             # Initialize the hardware if it wasn't already initialized
             self.init()
 
+        image_buffer = self.getbuffer(image, self.MODE_1GRAY)
+        self._last_image = None
+
+        left, right = max(x, 0) // 8, (min(x + w, self.width) - 1) // 8
+        top, bottom = max(y, 0), min(y + h, self.height) - 1
+        if left > right or top > bottom:
+            self.log.warning("Partial update box is outside the display")
+            return
+
+        self._partial_refresh_count += 1
+        if self._partial_refresh_count > self.partial_refresh_limit:
+            self._partial_refresh_count = 0
+            self._last_frame = None
+            self._write_frame_changes(image_buffer)
+            self.load_lut(self.lut.lut_1Gray_GC)
+            self.send_command(MASTER_ACTIVATION)
+            self.wait_until_idle()
+            return
+
+        frame = np.frombuffer(image_buffer, dtype=np.uint8)
+        frame = frame.reshape(self.height, self._BYTES_PER_ROW)
+        # RAM contents are unknown until the write below goes through
+        last_frame, self._last_frame = self._last_frame, None
+        self._write_window(frame, left, top, right, bottom)
+        if last_frame is not None:
+            # RAM now holds the previous frame with the box replaced
+            last_frame = last_frame.copy()
+            last_frame[top:bottom + 1, left:right + 1] = \
+                frame[top:bottom + 1, left:right + 1]
+            self._last_frame = last_frame
+
+        self._refresh(self.MODE_1GRAY)
+
+    def display(self, image):
+        """ Display a full frame, doing a full screen refresh. If the image
+        is the one already in RAM, only the refresh is done """
         mode = image.mode
-        image_buffer = self.getbuffer(image, mode)
+        image_key = (mode, image.size, hashlib.blake2b(
+            image.tobytes(), digest_size=16).digest())
+        if self._init_performed and image_key == self._last_image:
+            self._refresh(mode)
+            return
+
+        self._display_buffer(self.getbuffer(image, mode), mode)
+        self._last_image = image_key
 
-        self.send_command(RAM_X_COUNTER)
-        self.send_data(0x00)
-        self.send_data(0x00)
-        self.send_command(RAM_Y_COUNTER)
-        self.send_data(0x00)
-        self.send_data(0x00)
+    def _display_buffer(self, image_buffer, mode):
+        if not self._init_performed:
+            # Initialize the hardware if it wasn't already initialized
+            self.init()
+        self._last_image = None
 
         if mode == self.MODE_1GRAY:
-            self.send_command(WRITE_RAM_BW)
-            self.send_data2(image_buffer)
+            self._write_frame_changes(image_buffer)
 
+        if mode == self.MODE_4GRAY:
+            self._last_frame = None
+            self._reset_ram_counters()
+
+            # each plane byte covers 8 pixels, i.e. two bytes of the 4-gray
+            # buffer: the first one supplies the high nibble
+            image_buffer = np.frombuffer(bytes(image_buffer), dtype=np.uint8)
+            high, low = image_buffer[0::2], image_buffer[1::2]
+
+            # stream the BW plane from the worker thread while the RED plane
+            # is repacked
+            self._pack_plane(_NIBBLE_LUT_BW, high, low, self._plane_bw)
+            bw_sent = self._background().submit(
+                self.send_command_with_data, WRITE_RAM_BW, self._plane_bw)
+            self._pack_plane(_NIBBLE_LUT_RED, high, low, self._plane_red)
+            bw_sent.result()
+
+            self._reset_ram_counters()
+
+            self.send_command_with_data(WRITE_RAM_RED, self._plane_red)
+
+        self._refresh(mode)
+
+    def _pack_plane(self, lut, high, low, plane):
+        """ Fill `plane` in place from the nibble `lut` lookups of the high and
+        low 4-gray bytes, using a preallocated scratch plane for the low ones """
+        np.take(lut, high, out=plane)
+        plane <<= 4
+        np.take(lut, low, out=self._nibbles)
+        plane |= self._nibbles
+
+    def _refresh(self, mode):
+        """ Refresh the whole panel from the frame in RAM """
+        if mode == self.MODE_1GRAY:
             self.load_lut(self.lut.lut_1Gray_A2)
             self.send_command(MASTER_ACTIVATION)
 
         if mode == self.MODE_4GRAY:
-            buf = []
-            for i in range(0, (int)(self.height*(self.width/8))):
-                temp3 = 0
-                for j in range(0, 2):
-                    temp1 = image_buffer[i*2+j]
-                    for k in range(0, 2):
-                        temp2 = temp1 & 0xC0
-                        if(temp2 == 0xC0):
-                            temp3 |= 0x01  # white
-                        elif(temp2 == 0x00):
-                            temp3 |= 0x00  # black
-                        elif(temp2 == 0x80):
-                            temp3 |= 0x00  # gray1
-                        else:  # 0x40
-                            temp3 |= 0x01  # gray2
-                        temp3 <<= 1
-                        temp1 <<= 2
-                        temp2 = temp1 & 0xC0
-                        if(temp2 == 0xC0):  # white
-                            temp3 |= 0x01
-                        elif(temp2 == 0x00):  # black
-                            temp3 |= 0x00
-                        elif(temp2 == 0x80):
-                            temp3 |= 0x00  # gray1
-                        else:  # 0x40
-                            temp3 |= 0x01  # gray2
-                        if(j != 1 or k != 1):
-                            temp3 <<= 1
-                        temp1 <<= 2
-                # self.send_data(temp3)
-                buf.append(temp3)
-
-            self.send_command(WRITE_RAM_BW)
-            self.send_data2(buf)
-
-            self.send_command(RAM_X_COUNTER)
-            self.send_data2([0x00, 0x00])
-            self.send_command(RAM_Y_COUNTER)
-            self.send_data2([0x00, 0x00])
-
-            buf = []
-            for i in range(0, (int)(self.height*(self.width/8))):
-                temp3 = 0
-                for j in range(0, 2):
-                    temp1 = image_buffer[i*2+j]
-                    for k in range(0, 2):
-                        temp2 = temp1 & 0xC0
-                        if(temp2 == 0xC0):
-                            temp3 |= 0x01  # white
-                        elif(temp2 == 0x00):
-                            temp3 |= 0x00  # black
-                        elif(temp2 == 0x80):
-                            temp3 |= 0x01  # gray1
-                        else:  # 0x40
-                            temp3 |= 0x00  # gray2
-                        temp3 <<= 1
-                        temp1 <<= 2
-                        temp2 = temp1 & 0xC0
-                        if(temp2 == 0xC0):  # white
-                            temp3 |= 0x01
-                        elif(temp2 == 0x00):  # black
-                            temp3 |= 0x00
-                        elif(temp2 == 0x80):
-                            temp3 |= 0x01  # gray1
-                        else:  # 0x40
-                            temp3 |= 0x00  # gray2
-                        if(j != 1 or k != 1):
-                            temp3 <<= 1
-                        temp1 <<= 2
-                # self.send_data(temp3)
-                buf.append(temp3)
-
-            self.send_command(WRITE_RAM_RED)
-            self.send_data2(buf)
-
             self.load_lut(self.lut.lut_4Gray_GC)
-            self.send_command(DISPLAY_UPDATE_CONTROL_2)
-            self.send_data(0xC7)
+            self.send_command_with_data(DISPLAY_UPDATE_CONTROL_2, bytes([0xC7]))
             self.send_command(MASTER_ACTIVATION)
 
         self.wait_until_idle()
 
-    def wait_until_idle(self):
-        """ Wait until screen is idle by polling the busy pin """
+    def wait_until_idle(self, timeout_ms=None):
+        """ Wait until screen is idle, woken by the busy pin's falling edge.
+        Returns False if `timeout_ms` ran out first """
         self.log.debug("Busy")
-        while(self.digital_read(BUSY_PIN) == 1):      # 0: busy, 1: idle
-            self.delay_ms(10)
+        if timeout_ms is not None:
+            deadline = time.monotonic() + timeout_ms / 1000.0
+        while(self.digital_read(BUSY_PIN) == 1):      # 1: busy, 0: idle
+            wait_s = BUSY_EDGE_TIMEOUT_MS / 1000.0
+            if timeout_ms is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.log.warning("Timed out waiting for the display")
+                    return False
+                wait_s = min(wait_s, remaining)
+            # the pin is re-read after every wake-up, so an edge that fired
+            # before the wait started is never missed
+            self._idle.wait(wait_s)
+            self._idle.clear()
         self.log.debug("Busy release")
+        return True
+
+    async def wait_until_idle_async(self, timeout_ms=None):
+        """ Awaitable wait_until_idle(), run in the event loop's default
+        executor so other work, e.g. rendering the next frame, can go on
+        during a refresh """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.wait_until_idle,
+                                          timeout_ms)
 
     def clear(self, mode=MODE_1GRAY):
-        buf = [self.GRAY1] * (int(self.width/8) * self.height)
+        buf = self._BLANK_PLANE
+        self._forget_ram()
 
-        self.send_command(RAM_X_COUNTER)
-        self.send_command(WRITE_RAM_RED)
-        self.send_command(RAM_Y_COUNTER)
-        self.send_command(WRITE_RAM_RED)
+        self._reset_ram_counters()
 
-        self.send_command(WRITE_RAM_BW)
-        self.send_data2(buf)
+        self.send_command_with_data(WRITE_RAM_BW, buf)
 
         if mode == self.MODE_1GRAY:
             self.load_lut(self.lut.lut_1Gray_DU)
 
         if mode == self.MODE_4GRAY:
-            self.send_command(WRITE_RAM_RED)
-            self.send_data2(buf)
+            self.send_command_with_data(WRITE_RAM_RED, buf)
             self.load_lut(self.lut.lut_4Gray_GC)
-            self.send_command(DISPLAY_UPDATE_CONTROL_2)
-            self.send_data(0xC7)
+            self.send_command_with_data(DISPLAY_UPDATE_CONTROL_2, bytes([0xC7]))
 
         self.send_command(MASTER_ACTIVATION)
         self.wait_until_idle()
@@ -0,0 +1,139 @@
+""" gpio.py contains thin wrappers around the GPIO libraries used to drive
+the e-paper display's control pins """
+try:
+    import lgpio
+except ImportError:
+    lgpio = None
+
+try:
+    import RPi.GPIO as GPIO
+except (ImportError, RuntimeError):
+    # RPi.GPIO raises RuntimeError when imported on anything but a Pi
+    GPIO = None
+
+
+class LgpioBackend(object):
+    """ GPIO access through lgpio and the /dev/gpiochip character device.
+    Each call is a single ioctl, and it is the only option on the Pi 5 """
+
+    def __init__(self, chip=0):
+        self.chip = chip
+        self._handle = None
+        self._callbacks = {}
+        self._line_flags = {}
+        self._claimed = set()
+
+    def open(self):
+        if self._handle is None:
+            self._handle = lgpio.gpiochip_open(self.chip)
+
+    def _release(self, pin):
+        # lines stay claimed across init() calls, so free one before it is
+        # claimed again in another mode
+        watcher = self._callbacks.pop(pin, None)
+        if watcher is not None:
+            watcher.cancel()
+        if pin in self._claimed:
+            lgpio.gpio_free(self._handle, pin)
+            self._claimed.discard(pin)
+
+    def setup_output(self, pin):
+        self._release(pin)
+        lgpio.gpio_claim_output(self._handle, pin)
+        self._claimed.add(pin)
+
+    def setup_input(self, pin, pull_down=False):
+        flags = lgpio.SET_PULL_DOWN if pull_down else 0
+        self._release(pin)
+        lgpio.gpio_claim_input(self._handle, pin, flags)
+        self._claimed.add(pin)
+        self._line_flags[pin] = flags
+
+    def output(self, pin, value):
+        lgpio.gpio_write(self._handle, pin, value)
+
+    def input(self, pin):
+        return lgpio.gpio_read(self._handle, pin)
+
+    def watch_falling(self, pin, callback):
+        """ Call `callback()` from a background thread on each falling edge,
+        replacing any callback already set on `pin`.
+        Returns False, leaving `pin` a plain input, if edge detection is not
+        available """
+        flags = self._line_flags.get(pin, 0)
+        self._release(pin)
+        try:
+            lgpio.gpio_claim_alert(self._handle, pin, lgpio.FALLING_EDGE, flags)
+        except lgpio.error:
+            lgpio.gpio_claim_input(self._handle, pin, flags)
+            self._claimed.add(pin)
+            return False
+        self._claimed.add(pin)
+        self._callbacks[pin] = lgpio.callback(
+            self._handle, pin, lgpio.FALLING_EDGE,
+            lambda chip, gpio, level, tick: callback())
+        return True
+
+    def cleanup(self):
+        for watcher in self._callbacks.values():
+            watcher.cancel()
+        self._callbacks.clear()
+        self._claimed.clear()
+        if self._handle is not None:
+            # closing the chip releases every pin claimed through it
+            lgpio.gpiochip_close(self._handle)
+            self._handle = None
+
+
+class RPiGPIOBackend(object):
+    """ GPIO access through RPi.GPIO, for systems without lgpio """
+
+    def __init__(self):
+        self._watched = set()
+
+    def open(self):
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setwarnings(False)
+
+    def setup_output(self, pin):
+        GPIO.setup(pin, GPIO.OUT)
+
+    def setup_input(self, pin, pull_down=False):
+        GPIO.setup(pin, GPIO.IN,
+                   pull_up_down=GPIO.PUD_DOWN if pull_down else GPIO.PUD_OFF)
+
+    def output(self, pin, value):
+        GPIO.output(pin, value)
+
+    def input(self, pin):
+        return GPIO.input(pin)
+
+    def watch_falling(self, pin, callback):
+        """ Call `callback()` from a background thread on each falling edge,
+        replacing any callback already set on `pin`.
+        Returns False if edge detection is not available """
+        if pin in self._watched:
+            GPIO.remove_event_detect(pin)
+            self._watched.discard(pin)
+        try:
+            GPIO.add_event_detect(pin, GPIO.FALLING,
+                                  callback=lambda channel: callback())
+        except RuntimeError:
+            # "Failed to add edge detection" on some kernels
+            return False
+        self._watched.add(pin)
+        return True
+
+    def cleanup(self):
+        # also removes any edge detection
+        GPIO.cleanup()
+        self._watched.clear()
+
+
+def default_backend():
+    """ Return the lowest-overhead GPIO backend that is installed """
+    if lgpio is not None:
+        return LgpioBackend()
+    if GPIO is not None:
+        return RPiGPIOBackend()
+    raise ImportError("Either lgpio or RPi.GPIO is required")
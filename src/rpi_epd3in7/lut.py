@@ -29,7 +29,7 @@
 
 
 class LUT(object):
-    lut_4Gray_GC = [
+    lut_4Gray_GC = bytes([
         0x2A,0x06,0x15,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x28,0x06,0x14,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x20,0x06,0x10,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
@@ -41,9 +41,9 @@ class LUT(object):
         0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x22,0x22,0x22,0x22,0x22
-    ]
+    ])
 
-    lut_1Gray_GC  = [
+    lut_1Gray_GC  = bytes([
         0x2A,0x05,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x05,0x2A,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x2A,0x15,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
@@ -55,9 +55,9 @@ class LUT(object):
         0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x22,0x22,0x22,0x22,0x22
-    ]
+    ])
 
-    lut_1Gray_DU  = [
+    lut_1Gray_DU  = bytes([
         0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x01,0x2A,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x0A,0x55,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
@@ -69,9 +69,9 @@ class LUT(object):
         0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x22,0x22,0x22,0x22,0x22
-    ]
+    ])
 
-    lut_1Gray_A2  = [
+    lut_1Gray_A2  = bytes([
         0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x0A,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
         0x05,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
@@ -83,4 +83,4 @@ class LUT(object):
         0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00, 
         0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00, 
         0x22,0x22,0x22,0x22,0x22
-    ]
\ No newline at end of file
+    ])
\ No newline at end of file